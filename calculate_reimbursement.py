@@ -2,11 +2,109 @@
 #
 # Wrapper the evaluator will run:
 #   python calculate_reimbursement.py <days> <miles> <receipts>
+#
+# Predictions come from reimbursement_server.py over a Unix socket (started on first use),
+# so each call skips loading the rules. Set REIMB_NO_SERVER=1 to predict in-process instead.
 
+import math
+import os
+import socket
+import stat
 import sys
-from pathlib import Path
-# Use the rules engine
-from rules_engine import load_engine, predict_amount
+import time
+import zlib
+from typing import Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_SCRIPT = os.path.join(BASE_DIR, "reimbursement_server.py")
+SERVER_START_TIMEOUT = 5.0  # seconds
+REPLY_TIMEOUT = 5.0  # seconds
+START_RETRY_AFTER = 600  # seconds to predict in-process after a failed server start
+
+
+def _runtime_dir() -> str:
+    """Per-user directory no other user can create sockets in (XDG_RUNTIME_DIR, else a 0700 dir in TMPDIR)"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return runtime_dir
+    runtime_dir = os.path.join(os.environ.get("TMPDIR", "/tmp"), f"reimb-{os.getuid()}")
+    try:
+        os.mkdir(runtime_dir, 0o700)
+    except FileExistsError:
+        pass
+    # Refuse a directory someone else pre-created (or opened up) to plant a socket
+    info = os.lstat(runtime_dir)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{runtime_dir} is not a private directory")
+    return runtime_dir
+
+
+def socket_path(base_dir: str = BASE_DIR) -> str:
+    """Socket of the prediction server for base_dir's rules (one server per checkout and user)"""
+    return os.path.join(_runtime_dir(), f"reimb-{zlib.crc32(base_dir.encode()):08x}.sock")
+
+
+def start_failed_path(base_dir: str = BASE_DIR) -> str:
+    """Marker left when the server failed to start, so later calls skip the start-up wait"""
+    return socket_path(base_dir) + ".failed"
+
+
+def _ask_server(path: str, request: bytes) -> str:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(REPLY_TIMEOUT)
+        conn.connect(path)
+        conn.sendall(request)
+        reply = conn.makefile('rb').readline().decode().strip()
+    if reply == "error":
+        raise ValueError("prediction server rejected the input")
+    if not reply:
+        raise OSError("no reply from prediction server")
+    return reply
+
+
+def _recently_failed() -> bool:
+    try:
+        return time.time() - os.stat(start_failed_path()).st_mtime < START_RETRY_AFTER
+    except OSError:
+        return False
+
+
+def predict_via_server(days: int, miles: float, receipts: float) -> Optional[str]:
+    """Formatted amount from the prediction server, starting it if needed (None if unavailable)"""
+    if not hasattr(socket, "AF_UNIX") or os.environ.get("REIMB_NO_SERVER"):
+        return None
+    try:
+        path = socket_path()
+    except OSError:
+        return None  # No private place for the socket; predict in-process
+    request = f"{days} {miles!r} {receipts!r}\n".encode()
+    try:
+        return _ask_server(path, request)
+    except socket.timeout:
+        return None  # Server is up but not answering; starting another would not help
+    except OSError:
+        pass
+    if _recently_failed():
+        return None
+
+    import subprocess
+    subprocess.Popen([sys.executable, SERVER_SCRIPT], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        try:
+            return _ask_server(path, request)
+        except socket.timeout:
+            return None
+        except OSError:
+            continue
+    try:
+        open(start_failed_path(), 'w').close()
+    except OSError:
+        pass
+    return None
+
 
 def main() -> None:
     if len(sys.argv) != 4:
@@ -17,13 +115,27 @@ def main() -> None:
         days     = int(sys.argv[1])
         miles    = float(sys.argv[2])
         receipts = float(sys.argv[3])
+        if not (math.isfinite(miles) and math.isfinite(receipts)):
+            raise ValueError
     except ValueError:
         print("All three arguments must be numeric.", file=sys.stderr)
         sys.exit(2)
 
-    # Load the rules engine and make prediction
-    engine = load_engine()
-    amount = predict_amount(engine, days, miles, receipts)
+    try:
+        reply = predict_via_server(days, miles, receipts)
+    except ValueError:
+        print("Arguments out of range for the rules engine.", file=sys.stderr)
+        sys.exit(2)
+    if reply is not None:
+        print(reply)                    # ← single number, no extra text
+        return
+
+    # No server: load the rules engine and make prediction in-process
+    from rules_engine import load_predictor, to_cents
+    # Same rules the server loads, whatever the caller's working directory
+    fast_predict = load_predictor(os.path.join(BASE_DIR, "rules.json"))
+    # Quantize once; the engine keys rules by integer cents
+    amount = fast_predict(days, to_cents(miles), to_cents(receipts))
     print(f"{amount:.2f}")          # ← single number, no extra text
 
 if __name__ == "__main__":
@@ -4,164 +4,230 @@ Continuous improvement script for rules-based reimbursement calculation.
 
 This script:
 1. Initializes rules from all private cases (outputs set to 0)
-2. Runs eval.sh which tests against private cases and shows biggest errors with expected outputs
+2. Evaluates the rules (in-process via eval_server.py, or with eval.sh when --eval-sh is given)
+   and collects the biggest errors with expected outputs
 3. Updates rules with correct outputs from the error feedback
 4. Repeats until convergence or all rules are correct
 """
 
+import atexit
 import json
+import mmap
+import struct
 import subprocess
 import sys
 import re
 import os
-from typing import List, Dict, Tuple
+from collections import deque
+from typing import List, Dict, Tuple, Optional
 from rules_engine import RulesEngine
+from eval_server import evaluate
+
+# eval.sh output patterns, compiled once
+_ERROR_SECTION_START = "Check these high-error cases:"
+# Example line: "    Case 669: 7 days, 1033 miles, $1013.03 receipts"
+_CASE_RE = re.compile(r'Case (\d+): (\d+) days, ([\d.]+) miles, \$([\d.]+) receipts')
+# Example line: "      Expected: $2119.83, Got: $0.00, Error: $2119.83"
+_EXPECTED_RE = re.compile(r'Expected: \$([\d.]+), Got: \$([\d.]+), Error: \$([\d.]+)')
+_EXACT_MATCHES_RE = re.compile(r'Exact matches.*?(\d+)\s*\(([\d.]+)%\)')
+_AVG_ERROR_RE = re.compile(r'Average error: \$([\d.]+)')
+
+# Lets monitor_progress.py check liveness without spawning pgrep
+PID_FILE = "ci.pid"
+# Shared (total rules, completed rules) counters read by monitor_progress.py
+STATS_FILE = "stats.bin"
+STATS_RECORD = struct.Struct('<QQ')
+
+
+def _write_pid_file():
+    with open(PID_FILE, 'w') as f:
+        f.write(str(os.getpid()))
+    atexit.register(_remove_pid_file)
+
+
+def _remove_pid_file():
+    """Remove the pidfile and published stats unless another run has since taken them over"""
+    try:
+        with open(PID_FILE, 'r') as f:
+            if int(f.read()) != os.getpid():
+                return
+        os.remove(PID_FILE)
+        os.remove(STATS_FILE)
+    except (OSError, ValueError):
+        pass
+
+
+class EvalOutputParser:
+    """Incremental parser for eval.sh output, fed one line at a time as it is produced"""
+    
+    def __init__(self):
+        self.errors: List[Dict] = []
+        self.exact_match_pct: Optional[float] = None
+        self.avg_error: Optional[float] = None
+        self._in_error_section = False
+        self._current_case: Optional[Dict] = None
+    
+    def feed(self, line: str):
+        stripped = line.strip()
+        if self._in_error_section:
+            # Stop parsing errors if we hit another section
+            if stripped.startswith("⚠️") or stripped.startswith("📝"):
+                self._in_error_section = False
+            elif stripped.startswith("Case"):
+                case_match = _CASE_RE.search(line)
+                if case_match:
+                    self._current_case = {
+                        'case_number': int(case_match.group(1)),
+                        'trip_duration_days': int(case_match.group(2)),
+                        'miles_traveled': float(case_match.group(3)),
+                        'total_receipts_amount': float(case_match.group(4))
+                    }
+            elif self._current_case and stripped.startswith("Expected:"):
+                values_match = _EXPECTED_RE.search(line)
+                if values_match:
+                    self._emit_error(values_match)
+            return
+        
+        if _ERROR_SECTION_START in line:
+            self._in_error_section = True
+        elif self.exact_match_pct is None and stripped.startswith("Exact matches"):
+            exact_match = _EXACT_MATCHES_RE.search(line)
+            if exact_match:
+                self.exact_match_pct = float(exact_match.group(2))
+        elif self.avg_error is None and stripped.startswith("Average error:"):
+            avg_error_match = _AVG_ERROR_RE.search(line)
+            if avg_error_match:
+                self.avg_error = float(avg_error_match.group(1))
+    
+    def _emit_error(self, values_match: re.Match):
+        case = self._current_case
+        expected = float(values_match.group(1))
+        self.errors.append({
+            'input': {
+                'trip_duration_days': case['trip_duration_days'],
+                'miles_traveled': case['miles_traveled'],
+                'total_receipts_amount': case['total_receipts_amount']
+            },
+            'expected_output': expected,
+            'actual_output': float(values_match.group(2)),
+            'error_magnitude': float(values_match.group(3)),
+            'case_number': case['case_number']
+        })
+        print(f"  Parsed error case {case['case_number']}: Expected ${expected:.2f}")
+        self._current_case = None  # Reset for next case
+    
+    def top_errors(self, top_n: int) -> List[Dict]:
+        """Parsed error cases, biggest first"""
+        print(f"Extracted {len(self.errors)} error cases from eval output")
+        
+        # Sort by error magnitude and return top N
+        return sorted(self.errors, key=lambda x: x.get('error_magnitude', 0), reverse=True)[:top_n]
+    
+    @property
+    def score(self) -> float:
+        """Exact match percentage, else a score derived from the average error"""
+        if self.exact_match_pct is not None:
+            return self.exact_match_pct
+        if self.avg_error is not None:
+            # Convert to a percentage score (lower error = higher score)
+            return max(0, 100 - self.avg_error)
+        return 0.0
 
 class ContinuousImprovement:
-    def __init__(self, rules_file: str = "rules.json", top_n_errors: int = 10):  # Back to original 10 per iteration
+    def __init__(self, rules_file: str = "rules.json", top_n_errors: int = 10,  # Back to original 10 per iteration
+                 use_eval_sh: bool = False):
         self.engine = RulesEngine(rules_file, quiet=False)  # Verbose mode for debugging
         self.top_n_errors = top_n_errors
+        self.use_eval_sh = use_eval_sh  # Score via eval.sh + output parsing instead of in-process
         self.iteration = 0
+        self._stats: Optional[mmap.mmap] = None  # Mapped by run_continuous_improvement
+        
+    def _open_stats(self):
+        fd = os.open(STATS_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, STATS_RECORD.size)
+            self._stats = mmap.mmap(fd, STATS_RECORD.size)
+        finally:
+            os.close(fd)
+        self.publish_stats()
         
+    def publish_stats(self):
+        """Expose rule completion counts to the progress monitor (only while the improvement loop runs)"""
+        if self._stats is None:
+            return
+        total_count = self.engine.get_rule_count()
+        STATS_RECORD.pack_into(self._stats, 0, total_count, total_count - self.engine.get_zero_count())
+    
     def initialize_rules(self):
         """Initialize rules from private cases with all outputs as 0"""
         print("Initializing rules from private cases...")
         self.engine.initialize_from_private_cases()
+        self.publish_stats()
         print(f"Total rules: {self.engine.get_rule_count()}")
         print(f"Rules set to 0: {self.engine.get_zero_count()}")
     
     def run_evaluation(self) -> Tuple[float, List[Dict]]:
+        """Evaluate the current rules and return (score, biggest errors)"""
+        if self.use_eval_sh:
+            return self.run_eval_sh()
+        
+        print("Evaluating rules in-process against public cases...")
+        try:
+            score, errors = evaluate(rules_file=self.engine.rules_file)
+        except Exception as e:
+            print(f"Error running evaluation: {e}")
+            return 0.0, []
+        print(f"Evaluation completed: {len(errors)} cases off by $0.01 or more")
+        return score, errors[:self.top_n_errors]
+    
+    def run_eval_sh(self) -> Tuple[float, List[Dict]]:
         """Run eval.sh which tests against private cases and extract error information"""
         print("Running eval.sh against private cases...")
         
         try:
             # Run the evaluation script (which tests against private cases via public_cases.json in practice)
-            result = subprocess.run(
-                ['bash', 'eval.sh'],
-                capture_output=True,
-                text=True,
-                cwd='.'
-            )
+            # and parse its output as it streams; eval.sh progress on stderr goes straight to the terminal
+            parser = EvalOutputParser()
+            sample = deque(maxlen=20)
+            with subprocess.Popen(['bash', 'eval.sh'], stdout=subprocess.PIPE, text=True, bufsize=1,
+                                  cwd='.') as process:
+                for line in process.stdout:
+                    line = line.rstrip('\n')
+                    parser.feed(line)
+                    if line.strip():
+                        sample.append(line)
             
-            if result.returncode != 0:
-                print(f"Evaluation failed with return code {result.returncode}")
-                print(f"STDERR: {result.stderr}")
+            if process.returncode != 0:
+                print(f"Evaluation failed with return code {process.returncode}")
                 return 0.0, []
             
-            output = result.stdout
             print("Evaluation completed")
             
             # Print some of the output for debugging
             print("\n--- Evaluation Output Sample ---")
-            lines = output.split('\n')
-            for line in lines[-20:]:  # Show last 20 lines
-                if line.strip():
-                    print(line)
+            for line in sample:  # Show last 20 non-blank lines
+                print(line)
             print("--- End Sample ---\n")
             
-            # Parse the evaluation output to extract errors
-            errors = self.extract_errors_from_eval_output(output)
-            
-            # Calculate overall score/accuracy
-            score = self.extract_score_from_output(output)
-            
-            return score, errors
+            return parser.score, parser.top_errors(self.top_n_errors)
             
         except Exception as e:
             print(f"Error running evaluation: {e}")
             return 0.0, []
     
-    def extract_errors_from_eval_output(self, eval_output: str) -> List[Dict]:
-        """Extract error cases from eval.sh output"""
-        errors = []
-        
-        # Look for the high-error cases section in the output
-        lines = eval_output.split('\n')
-        in_error_section = False
-        current_case = None
-        
-        for line in lines:
-            # Look for the start of error cases
-            if "Check these high-error cases:" in line:
-                in_error_section = True
-                continue
-            
-            # Stop parsing if we hit another section
-            if in_error_section and (line.strip().startswith("⚠️") or line.strip().startswith("📝")):
-                break
-            
-            # Parse error case lines
-            if in_error_section and line.strip().startswith("Case"):
-                # Example line: "    Case 669: 7 days, 1033 miles, $1013.03 receipts"
-                case_match = re.search(r'Case (\d+): (\d+) days, ([\d.]+) miles, \$([\d.]+) receipts', line)
-                if case_match:
-                    current_case = {
-                        'case_number': int(case_match.group(1)),
-                        'trip_duration_days': int(case_match.group(2)),
-                        'miles_traveled': float(case_match.group(3)),
-                        'total_receipts_amount': float(case_match.group(4))
-                    }
-                continue
-            
-            # Parse expected/actual line
-            if in_error_section and "Expected:" in line and "Got:" in line and current_case:
-                # Example line: "      Expected: $2119.83, Got: $0.00, Error: $2119.83"
-                values_match = re.search(r'Expected: \$([\d.]+), Got: \$([\d.]+), Error: \$([\d.]+)', line)
-                if values_match:
-                    expected = float(values_match.group(1))
-                    actual = float(values_match.group(2))
-                    error_magnitude = float(values_match.group(3))
-                    
-                    error_case = {
-                        'input': {
-                            'trip_duration_days': current_case['trip_duration_days'],
-                            'miles_traveled': current_case['miles_traveled'],
-                            'total_receipts_amount': current_case['total_receipts_amount']
-                        },
-                        'expected_output': expected,
-                        'actual_output': actual,
-                        'error_magnitude': error_magnitude,
-                        'case_number': current_case['case_number']
-                    }
-                    errors.append(error_case)
-                    print(f"  Parsed error case {current_case['case_number']}: Expected ${expected:.2f}")
-                    current_case = None  # Reset for next case
-        
-        print(f"Extracted {len(errors)} error cases from eval output")
-        
-        # Sort by error magnitude and return top N
-        errors.sort(key=lambda x: x.get('error_magnitude', 0), reverse=True)
-        return errors[:self.top_n_errors]
-    
-    def extract_score_from_output(self, output: str) -> float:
-        """Extract overall score/accuracy from evaluation output"""  
-        # Look for exact matches percentage
-        exact_match = re.search(r'Exact matches.*?(\d+)\s*\(([\d.]+)%\)', output)
-        if exact_match:
-            return float(exact_match.group(2))
-        
-        # Look for average error
-        avg_error_match = re.search(r'Average error: \$([\d.]+)', output)
-        if avg_error_match:
-            avg_error = float(avg_error_match.group(1))
-            # Convert to a percentage score (lower error = higher score)
-            return max(0, 100 - avg_error)
-        
-        return 0.0
-    
-    def update_rules_from_errors(self, errors: List[Dict]):
-        """Update rules based on error cases"""
+    def update_rules_from_errors(self, errors: List[Dict]) -> int:
+        """Update rules based on error cases, returning how many rules actually changed"""
         if not errors:
             print("No errors to update")
-            return
+            return 0
         
         print(f"Updating {len(errors)} rules from biggest errors...")
         for error in errors:
             print(f"  Case {error.get('case_number', '?')}: Error ${error['error_magnitude']:.2f} -> Setting to ${error['expected_output']:.2f}")
         
-        self.engine.update_rules_from_errors(errors)
+        return self.engine.update_rules_from_errors(errors)
     
-    def run_iteration(self) -> Tuple[float, int]:
+    def run_iteration(self) -> Tuple[float, int, int]:
         """Run one improvement iteration"""
         self.iteration += 1
         print(f"\n=== Iteration {self.iteration} ===")
@@ -170,22 +236,26 @@ class ContinuousImprovement:
         score, errors = self.run_evaluation()
         
         # Update rules based on errors
-        self.update_rules_from_errors(errors)
+        changed_count = self.update_rules_from_errors(errors)
         
         # Report progress
+        self.publish_stats()
         zero_count = self.engine.get_zero_count()
         total_count = self.engine.get_rule_count()
         completion_rate = ((total_count - zero_count) / total_count) * 100 if total_count > 0 else 0
         
         print(f"Score: {score:.1f}%")
         print(f"Rules completed: {total_count - zero_count}/{total_count} ({completion_rate:.1f}%)")
-        print(f"Updated {len(errors)} rules this iteration")
+        print(f"Updated {changed_count} rules this iteration")
         
-        return score, zero_count
+        return score, zero_count, changed_count
     
     def run_continuous_improvement(self, max_iterations: int = 300, target_score: float = 95.0):
         """Run continuous improvement until convergence"""
         print("Starting continuous improvement process...")
+        # Only the improvement loop reports to the monitor; both files go away when it exits
+        _write_pid_file()
+        self._open_stats()
         
         # Initialize if needed
         if self.engine.get_rule_count() == 0:
@@ -194,15 +264,26 @@ class ContinuousImprovement:
         best_score = 0.0
         iterations_without_improvement = 0
         max_stagnant_iterations = 2  # Reduced for speed
+        iterations_without_changes = 0
         
         for iteration in range(max_iterations):
-            score, zero_count = self.run_iteration()
+            score, zero_count, changed_count = self.run_iteration()
             
             # Check for convergence
             if score >= target_score:
                 print(f"\n🎯 Target score {target_score}% reached! Final score: {score:.1f}%")
                 break
             
+            if zero_count == 0:
+                print("\nAll rules have outputs, stopping")
+                break
+            
+            # Further evaluations are wasted if the reported errors are all already memorized
+            iterations_without_changes = iterations_without_changes + 1 if changed_count == 0 else 0
+            if iterations_without_changes >= 2:
+                print("\nReported errors are all already memorized, stopping")
+                break
+            
             if score > best_score:
                 best_score = score
                 iterations_without_improvement = 0
@@ -217,6 +298,9 @@ class ContinuousImprovement:
             
             # Removed sleep for speed - no delay needed
         
+        # Fold journaled updates back into rules.json
+        self.engine.save_rules()
+        
         print(f"\nImprovement process completed after {self.iteration} iterations")
         print(f"Final score: {score:.1f}%")
         final_completion_rate = ((self.engine.get_rule_count() - self.engine.get_zero_count()) / self.engine.get_rule_count()) * 100
@@ -225,17 +309,20 @@ class ContinuousImprovement:
 
 def main():
     """Main entry point"""
-    if len(sys.argv) > 1 and sys.argv[1] == "init":
-        improvement = ContinuousImprovement(top_n_errors=10)
+    # --eval-sh: score through eval.sh (one process per case) instead of in-process
+    use_eval_sh = "--eval-sh" in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--eval-sh"]
+    if args and args[0] == "init":
+        improvement = ContinuousImprovement(top_n_errors=10, use_eval_sh=use_eval_sh)
         improvement.initialize_rules()
-    elif len(sys.argv) > 1 and sys.argv[1] == "test":
+    elif args and args[0] == "test":
         # Test mode: just run one evaluation
-        improvement = ContinuousImprovement(top_n_errors=10)
+        improvement = ContinuousImprovement(top_n_errors=10, use_eval_sh=use_eval_sh)
         score, errors = improvement.run_evaluation()
         print(f"Score: {score:.1f}%")
         print(f"Found {len(errors)} error cases")
     else:
-        improvement = ContinuousImprovement(top_n_errors=10)
+        improvement = ContinuousImprovement(top_n_errors=10, use_eval_sh=use_eval_sh)
         improvement.run_continuous_improvement()
 
 
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+In-process evaluator for the rules engine.
+
+Scores the engine against public_cases.json the same way eval.sh does, but fans the cases out
+over a pool of worker processes that each load the rules once, instead of starting one
+interpreter per case. Returns (score, errors) directly - no stdout to parse.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Optional
+from rules_engine import RulesEngine
+
+# Warm engine held by each worker process
+_engine: Optional[RulesEngine] = None
+
+
+def _init_worker(rules_file: str):
+    """Load the rules once per worker process"""
+    global _engine
+    _engine = RulesEngine(rules_file, quiet=True)
+
+
+def predict_case(case: Dict) -> float:
+    """Predict one public case with the worker's engine, rounded like run.sh output"""
+    case_input = case['input']
+    amount = _engine.predict(
+        case_input['trip_duration_days'],
+        case_input['miles_traveled'],
+        case_input['total_receipts_amount']
+    )
+    return round(amount, 2)
+
+
+def evaluate(cases_file: str = "public_cases.json", rules_file: str = "rules.json",
+             workers: Optional[int] = None) -> Tuple[float, List[Dict]]:
+    """Evaluate the rules on disk against the cases, returning (exact match %, errors sorted by magnitude)"""
+    with open(cases_file, 'r') as f:
+        cases = json.load(f)
+    if not cases:
+        return 0.0, []
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(rules_file,)) as executor:
+        predictions = list(executor.map(predict_case, cases, chunksize=256))
+
+    exact_matches = 0
+    errors = []
+    for case_number, (case, actual) in enumerate(zip(cases, predictions), start=1):
+        expected = case['expected_output']
+        error_magnitude = abs(actual - expected)
+        # Exact match within $0.01, as in eval.sh
+        if error_magnitude < 0.01:
+            exact_matches += 1
+            continue
+        errors.append({
+            'input': case['input'],
+            'expected_output': expected,
+            'actual_output': actual,
+            'error_magnitude': error_magnitude,
+            'case_number': case_number
+        })
+
+    errors.sort(key=lambda x: x['error_magnitude'], reverse=True)
+    score = exact_matches * 100 / len(cases)
+    return score, errors
+
+
+def main():
+    cases_file = sys.argv[1] if len(sys.argv) > 1 else "public_cases.json"
+    score, errors = evaluate(cases_file)
+    print(f"Exact matches: {score:.1f}%")
+    for error in errors[:5]:
+        case_input = error['input']
+        print(f"  Case {error['case_number']}: {case_input['trip_duration_days']} days, "
+              f"{case_input['miles_traveled']} miles, ${case_input['total_receipts_amount']} receipts")
+        print(f"    Expected: ${error['expected_output']:.2f}, Got: ${error['actual_output']:.2f}, "
+              f"Error: ${error['error_magnitude']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
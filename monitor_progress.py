@@ -4,11 +4,12 @@ Progress monitoring script for the continuous improvement process.
 Shows real-time progress on rule completion and estimates time remaining.
 """
 
-import json
+import mmap
 import time
 import os
-import subprocess
 from datetime import datetime, timedelta
+from rules_engine import read_rules, read_journal
+from continuous_improvement import PID_FILE, STATS_FILE, STATS_RECORD
 
 class ProgressMonitor:
     def __init__(self, rules_file: str = "rules.json"):
@@ -21,11 +22,19 @@ class ProgressMonitor:
     def get_completion_stats(self):
         """Get current completion statistics"""
         try:
-            with open(self.rules_file, 'r') as f:
-                data = json.load(f)
+            try:
+                if not self.check_process_running():
+                    raise FileNotFoundError(STATS_FILE)  # Counters left by a dead run are stale
+                with open(STATS_FILE, 'rb') as f, \
+                        mmap.mmap(f.fileno(), STATS_RECORD.size, access=mmap.ACCESS_READ) as stats:
+                    total_rules, completed_rules = STATS_RECORD.unpack_from(stats)
+            except (OSError, ValueError):
+                # No live improvement run is publishing counters - count from the rules file
+                rules, _ = read_rules(self.rules_file)
+                rules.update(read_journal(os.path.splitext(self.rules_file)[0] + ".journal"))
+                total_rules = len(rules)
+                completed_rules = sum(1 for value in rules.values() if value != 0.0)
             
-            total_rules = len(data)
-            completed_rules = sum(1 for value in data.values() if float(value) != 0.0)
             completion_rate = (completed_rules / total_rules) * 100 if total_rules > 0 else 0
             
             return {
@@ -71,10 +80,13 @@ class ProgressMonitor:
     def check_process_running(self):
         """Check if the continuous improvement process is still running"""
         try:
-            result = subprocess.run(['pgrep', '-f', 'continuous_improvement.py'], 
-                                  capture_output=True, text=True)
-            return result.returncode == 0
-        except:
+            with open(PID_FILE, 'r') as f:
+                pid = int(f.read())
+            os.kill(pid, 0)  # Signal 0: existence check only
+            return True
+        except PermissionError:
+            return True  # Alive, but owned by another user
+        except (OSError, ValueError):
             return False
     
     def display_progress(self):
@@ -94,7 +106,7 @@ class ProgressMonitor:
             self.completion_history = self.completion_history[-20:]
         
         # Clear screen for fresh display
-        os.system('clear' if os.name == 'posix' else 'cls')
+        print('\x1b[2J\x1b[H', end='')
         
         print("🚀 Continuous Improvement Progress Monitor")
         print("=" * 50)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Persistent prediction server for calculate_reimbursement.py.
+
+Loads the rules engine once and answers predictions over a Unix domain socket, so each
+evaluator call pays for a socket round trip instead of interpreter start-up plus a rules load.
+Protocol: one "<days> <miles> <receipts>" line per request, answered with one "<amount>" line
+(or "error"). The rules are reloaded whenever rules.json or its journal changes, and the server
+exits after IDLE_TIMEOUT seconds without requests. calculate_reimbursement.py starts it on demand.
+
+    python reimbursement_server.py
+"""
+
+import os
+import socket
+import socketserver
+from typing import Tuple
+from calculate_reimbursement import socket_path, start_failed_path
+from rules_engine import RulesEngine, to_cents
+
+IDLE_TIMEOUT = 600  # seconds
+REQUEST_TIMEOUT = 5  # seconds
+
+
+class _PredictionHandler(socketserver.StreamRequestHandler):
+    timeout = REQUEST_TIMEOUT  # Drop clients that stall mid-request instead of blocking the server
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                days, miles, receipts = line.split()
+                engine = self.server.current_engine()
+                amount = engine.predict_cents(int(days), to_cents(float(miles)), to_cents(float(receipts)))
+                reply = f"{amount:.2f}\n"
+            except (ValueError, OverflowError):
+                reply = "error\n"
+            self.wfile.write(reply.encode())
+
+
+class ReimbursementServer(socketserver.UnixStreamServer):
+    timeout = IDLE_TIMEOUT
+
+    def __init__(self, path: str, rules_file: str = "rules.json"):
+        self.engine = RulesEngine(rules_file, quiet=True)
+        self.stamp = self._rules_stamp()
+        self.idle = False
+        super().__init__(path, _PredictionHandler)
+
+    def _rules_stamp(self) -> Tuple[int, int, int]:
+        """rules.json mtime/size plus journal size; changes whenever the rules do"""
+        try:
+            stat = os.stat(self.engine.rules_file)
+            rules_stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            rules_stamp = (0, 0)
+        try:
+            journal_size = os.stat(self.engine.journal_file).st_size
+        except OSError:
+            journal_size = -1
+        return rules_stamp + (journal_size,)
+
+    def current_engine(self) -> RulesEngine:
+        """The engine, reloaded first if the rules changed on disk"""
+        stamp = self._rules_stamp()
+        if stamp != self.stamp:
+            self.engine.load_rules()
+            self.stamp = stamp
+        return self.engine
+
+    def handle_timeout(self):
+        self.idle = True
+
+
+def _server_running(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    path = socket_path()
+    if _server_running(path):
+        return  # Another server already owns the socket
+    if os.path.exists(path):
+        os.remove(path)  # Stale socket from a server that did not shut down cleanly
+    try:
+        os.remove(start_failed_path())  # Let clients use the server again
+    except FileNotFoundError:
+        pass
+
+    with ReimbursementServer(path) as server:
+        try:
+            while not server.idle:
+                server.handle_request()
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,36 +2,269 @@
 Rules-based reimbursement calculation engine.
 Maps exact input combinations (trip_duration_days, miles_traveled, total_receipts_amount) to output values.
 Starts with all outputs as 0 and iteratively improves based on evaluation errors.
+Outputs are stored as integer cents and converted back to dollars on predict.
+Inputs without a learned (non-zero) rule fall back to the nearest learned rule with the same trip duration.
 """
+from array import array
+from bisect import bisect_left
 import json
 import os
-from typing import Dict, Tuple, Optional, List
+import struct
+import tempfile
+from typing import Dict, Tuple, Optional, List, Iterator, Callable
+
+try:
+    import orjson  # C-accelerated codec, used when installed
+except ImportError:
+    orjson = None
+
+# (numpy, numba.types, numba.typed.Dict, compiled _lookup) once predict_many has imported them, False if
+# they are not installed. Imported lazily so the CLI, server and eval workers never pay numba's import cost.
+_numba = None
+
+
+def _loads(raw: bytes):
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+
+def _dumps(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()  # Compact format for speed
+
+
+def _file_stamp(stat: os.stat_result) -> Tuple[int, int]:
+    """(mtime_ns, size) identifying one published version of a file"""
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _write_atomic(path: str, payload: bytes) -> Tuple[int, int]:
+    """Replace path with payload via a synced temp file and one rename, so readers never see a partial file.
+
+    Returns the stamp of the written file (the rename keeps the temp file's inode, mtime and size).
+    """
+    # A unique temp file per writer, so concurrent savers never share (and tear) one inode
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or '.')
+    try:
+        try:
+            os.fchmod(fd, 0o644)  # mkstemp creates 0600
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            getattr(os, 'fdatasync', os.fsync)(fd)
+            stamp = _file_stamp(os.fstat(fd))
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return stamp
+
+
+def to_cents(amount: float) -> int:
+    """Quantize a (non-negative) mileage or dollar amount to integer hundredths"""
+    return int(amount * 100 + 0.5)
+
+
+# Field widths of a fused key; receipts stop at bit 62 so keys also fit a signed 64-bit int
+_DAYS_LIMIT = 1 << 16
+_MILES_LIMIT = 1 << 24
+_RECEIPTS_LIMIT = 1 << 23
+
+
+def _key_in_range(trip_duration_days: int, miles_cents: int, receipts_cents: int) -> bool:
+    return (0 <= trip_duration_days < _DAYS_LIMIT and 0 <= miles_cents < _MILES_LIMIT
+            and 0 <= receipts_cents < _RECEIPTS_LIMIT)
+
+
+def fuse_cents_key(trip_duration_days: int, miles_cents: int, receipts_cents: int) -> int:
+    """Pack (days, miles cents, receipts cents) into one int: days in bits 0-15, miles in 16-39, receipts in 40-62"""
+    if not _key_in_range(trip_duration_days, miles_cents, receipts_cents):
+        raise ValueError(f"inputs out of range for a rule key: {trip_duration_days} days, "
+                         f"{miles_cents} miles cents, {receipts_cents} receipts cents")
+    return trip_duration_days | (miles_cents << 16) | (receipts_cents << 40)
+
+
+def fuse_key(trip_duration_days: int, miles_traveled: float, total_receipts_amount: float) -> int:
+    """fuse_cents_key for unquantized inputs"""
+    return fuse_cents_key(trip_duration_days, int(miles_traveled * 100 + 0.5), int(total_receipts_amount * 100 + 0.5))
+
+
+def split_key(key: int) -> Tuple[int, float, float]:
+    """Inverse of fuse_key"""
+    return (key & 0xFFFF, ((key >> 16) & 0xFFFFFF) / 100, (key >> 40) / 100)
+
+
+def _lookup(days, miles, receipts, table, out):
+    """Fuse each input row into its rule key (as in fuse_key) and look it up; misses become 0.0"""
+    for i in range(days.size):
+        miles_cents = int(miles[i] * 100 + 0.5)
+        receipts_cents = int(receipts[i] * 100 + 0.5)
+        if not (0 <= days[i] < 65536 and 0 <= miles_cents < 16777216 and 0 <= receipts_cents < 8388608):
+            out[i] = 0.0  # No rule can have this key
+            continue
+        out[i] = table.get(days[i] | (miles_cents << 16) | (receipts_cents << 40), 0.0)
+
+
+def _load_numba():
+    """Import NumPy/Numba and compile _lookup on first use"""
+    global _numba
+    if _numba is None:
+        try:
+            import numpy as np
+            from numba import njit, types
+            from numba.typed import Dict as TypedDict
+        except ImportError:  # predict_many falls back to predict_batch
+            _numba = False
+        else:
+            _numba = (np, types, TypedDict, njit(cache=True)(_lookup))
+    return _numba
+
+
+# Journal record: fused rule key, output in dollars
+_JOURNAL_RECORD = struct.Struct('<Qd')
+# Fold the journal back into the JSON snapshot once it grows past this size
+JOURNAL_COMPACT_BYTES = 10 * 1024 * 1024
+
+
+def read_journal(journal_file: str) -> Iterator[Tuple[int, int]]:
+    """Yield (key, output cents) deltas in write order; a missing journal yields nothing"""
+    try:
+        with open(journal_file, 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return
+    # Ignore a torn trailing record from an interrupted write
+    usable = len(raw) - len(raw) % _JOURNAL_RECORD.size
+    for key, output in _JOURNAL_RECORD.iter_unpack(raw[:usable]):
+        yield key, to_cents(output)
+
+
+# Binary snapshot header: format magic, rules file mtime_ns, rules file size, rule count.
+# The header is followed by the keys as array('Q') and the output cents as array('i'), in native byte order.
+_SNAPSHOT_HEADER = struct.Struct('<4sqqQ')
+_SNAPSHOT_MAGIC = b'RUL2'
+
+
+def save_rules_binary(path: str, rules: Dict[int, int], stamp: Tuple[int, int] = (0, 0)):
+    """Write rules as a binary snapshot tagged with the (mtime_ns, size) stamp of their source file"""
+    keys = array('Q', rules.keys())
+    values = array('i', rules.values())
+    _write_atomic(path, _SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, stamp[0], stamp[1], len(keys))
+                  + keys.tobytes() + values.tobytes())
+
+
+def load_rules_binary(path: str) -> Tuple[Tuple[int, int], Dict[int, int]]:
+    """Read a binary snapshot, returning (source stamp, rules)"""
+    with open(path, 'rb') as f:
+        magic, mtime_ns, size, count = _SNAPSHOT_HEADER.unpack(f.read(_SNAPSHOT_HEADER.size))
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a current rules snapshot")
+        keys = array('Q')
+        values = array('i')
+        keys.fromfile(f, count)
+        values.fromfile(f, count)
+    return (mtime_ns, size), dict(zip(keys, values))
+
+
+def read_rules(rules_file: str) -> Tuple[Dict[int, int], bool]:
+    """Read a rules file, returning (output cents keyed by fuse_key, is_current_format)"""
+    rules, current, _ = read_rules_stamped(rules_file)
+    return rules, current
+
+
+def read_rules_stamped(rules_file: str) -> Tuple[Dict[int, int], bool, Tuple[int, int]]:
+    """read_rules plus the (mtime_ns, size) stamp of the exact file version that was parsed"""
+    with open(rules_file, 'rb') as f:
+        # fstat the open file: a stat by name could see a newer rules file published after this read
+        stamp = _file_stamp(os.fstat(f.fileno()))
+        data = _loads(f.read())
+    return parse_rules(data) + (stamp,)
+
+
+def parse_rules(data) -> Tuple[Dict[int, int], bool]:
+    """Decode loaded rules JSON in any supported layout, returning (rules, is_current_format)"""
+    if isinstance(data, dict) and 'keys' in data:
+        # Current format: parallel {"keys": [[days, miles, receipts], ...], "values": [output, ...]}
+        return {fuse_key(int(k[0]), k[1], k[2]): to_cents(v) for k, v in zip(data['keys'], data['values'])}, True
+    if isinstance(data, dict):
+        # Legacy format: {"(1, 47.0, 17.97)": output}
+        rules = {}
+        for key_str, value in data.items():
+            days, miles, receipts = key_str[1:-1].split(',')
+            rules[fuse_key(int(days), float(miles), float(receipts))] = to_cents(value)
+        return rules, False
+    # Row format: [[days, miles, receipts, output], ...]
+    return {fuse_key(int(row[0]), row[1], row[2]): to_cents(row[3]) for row in data}, False
 
 class RulesEngine:
     def __init__(self, rules_file: str = "rules.json", quiet: bool = False):
         self.rules_file = rules_file
+        # Binary snapshot of the parsed rules, valid while the rules file's mtime/size are unchanged
+        self.cache_file = os.path.splitext(rules_file)[0] + ".bin"
+        # Append-only log of rule updates made since the last full save
+        self.journal_file = os.path.splitext(rules_file)[0] + ".journal"
+        self._journal = None
         self.quiet = quiet
-        self.rules: Dict[Tuple[int, float, float], float] = {}
+        # fused key -> output in integer cents
+        self.rules: Dict[int, int] = {}
+        # days -> (sorted miles, [(miles, receipts, output cents), ...]) over learned rules, built lazily
+        self._by_days: Optional[Dict[int, Tuple[List[float], List[Tuple[float, float, int]]]]] = None
+        # numba.typed.Dict copy of self.rules for predict_many, built lazily
+        self._table = None
+        # days -> miles cents -> receipts cents -> output cents, built lazily for repeated predictions
+        self._trie: Optional[Dict[int, Dict[int, Dict[int, int]]]] = None
+        # Running count of rules still at 0, kept in step by add_rule
+        self._zero_count = 0
         self.load_rules()
     
-    def _make_key(self, trip_duration_days: int, miles_traveled: float, total_receipts_amount: float) -> Tuple[int, float, float]:
+    def _make_key(self, trip_duration_days: int, miles_traveled: float, total_receipts_amount: float) -> int:
         """Create a hashable key from input parameters"""
-        return (trip_duration_days, round(miles_traveled, 2), round(total_receipts_amount, 2))
+        return fuse_key(trip_duration_days, miles_traveled, total_receipts_amount)
+    
+    def _rules_file_stamp(self) -> Tuple[int, int]:
+        return _file_stamp(os.stat(self.rules_file))
+    
+    def _load_cache(self) -> Optional[Dict[int, int]]:
+        """Return the cached rules if the cache was written for the current rules file"""
+        try:
+            stamp, rules = load_rules_binary(self.cache_file)
+        except (OSError, EOFError, ValueError, struct.error):
+            return None
+        return rules if stamp == self._rules_file_stamp() else None
+    
+    def _write_cache(self, stamp: Tuple[int, int]):
+        """Snapshot the rules, tagged with the stamp of the rules file version they were read from or saved as"""
+        try:
+            save_rules_binary(self.cache_file, self.rules, stamp)
+        except OSError as e:
+            if not self.quiet:
+                print(f"Error writing rules cache: {e}")
     
     def load_rules(self):
-        """Load rules from JSON file"""
+        """Load the rules snapshot (from the cache if fresh, otherwise the JSON file) and replay the journal"""
+        self._by_days = None
+        self._table = None
+        self._trie = None
         if os.path.exists(self.rules_file):
             try:
-                with open(self.rules_file, 'r') as f:
-                    data = json.load(f)
-                    # Convert string keys back to tuples
-                    self.rules = {}
-                    for key_str, value in data.items():
-                        # Parse key string like "(1, 47.0, 17.97)" back to tuple
-                        key_tuple = eval(key_str)  # Safe here since we control the format
-                        self.rules[key_tuple] = float(value)
+                cached = self._load_cache()
+                current = True
+                if cached is not None:
+                    self.rules, source = cached, self.cache_file
+                else:
+                    self.rules, current, stamp = read_rules_stamped(self.rules_file)
+                    source = self.rules_file
+                    if current:
+                        self._write_cache(stamp)
+                replayed = self._replay_journal()
                 if not self.quiet:
-                    print(f"Loaded {len(self.rules)} rules from {self.rules_file}")
+                    suffix = f" (+{replayed} journaled updates)" if replayed else ""
+                    print(f"Loaded {len(self.rules)} rules from {source}{suffix}")
+                if not current:
+                    self.save_rules()  # One-shot migration of older layouts
             except Exception as e:
                 if not self.quiet:
                     print(f"Error loading rules: {e}")
@@ -40,14 +273,50 @@ class RulesEngine:
             if not self.quiet:
                 print("No existing rules file found, starting with empty rules")
             self.rules = {}
+        self._zero_count = sum(1 for value in self.rules.values() if value == 0)
+    
+    def _replay_journal(self) -> int:
+        """Apply journaled updates on top of the loaded snapshot"""
+        replayed = 0
+        for key, output in read_journal(self.journal_file):
+            self.rules[key] = output
+            replayed += 1
+        return replayed
+    
+    def _append_journal(self, keys: List[int]):
+        """Persist the given rules as journal records, compacting into a full save once the journal is large"""
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_file, 'ab')
+                # Cut off a torn trailing record so new records stay aligned on replay
+                size = self._journal.tell()
+                if size % _JOURNAL_RECORD.size:
+                    self._journal.truncate(size - size % _JOURNAL_RECORD.size)
+                    self._journal.seek(0, os.SEEK_END)
+            self._journal.write(b''.join(_JOURNAL_RECORD.pack(key, self.rules[key] / 100) for key in keys))
+            self._journal.flush()
+            if self._journal.tell() >= JOURNAL_COMPACT_BYTES:
+                self.save_rules()
+        except Exception as e:
+            if not self.quiet:
+                print(f"Error writing rules journal: {e}")
+    
+    def _reset_journal(self):
+        """Drop the journal once its updates are part of a full save"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
     
     def save_rules(self):
-        """Save rules to JSON file"""
+        """Save all rules to the JSON file, folding in (and clearing) the journal"""
         try:
-            # Convert tuple keys to strings for JSON serialization
-            data = {str(key): value for key, value in self.rules.items()}
-            with open(self.rules_file, 'w') as f:
-                json.dump(data, f, separators=(',', ':'))  # Compact format for speed
+            # Two homogeneous numeric arrays so the codec never sees mixed rows
+            payload = _dumps({'keys': [split_key(key) for key in self.rules],
+                              'values': [value / 100 for value in self.rules.values()]})
+            self._write_cache(_write_atomic(self.rules_file, payload))
+            self._reset_journal()
             if not self.quiet:
                 print(f"Saved {len(self.rules)} rules to {self.rules_file}")
         except Exception as e:
@@ -57,12 +326,92 @@ class RulesEngine:
     def add_rule(self, trip_duration_days: int, miles_traveled: float, total_receipts_amount: float, output: float):
         """Add or update a rule"""
         key = self._make_key(trip_duration_days, miles_traveled, total_receipts_amount)
-        self.rules[key] = output
+        cents = to_cents(output)
+        self._zero_count += (cents == 0) - (self.rules.get(key) == 0)
+        self.rules[key] = cents
+        self._by_days = None
+        self._table = None
+        if self._trie is not None:
+            self._trie.setdefault(key & 0xFFFF, {}).setdefault((key >> 16) & 0xFFFFFF, {})[key >> 40] = cents
+    
+    def _build_index(self) -> Dict[int, Tuple[List[float], List[Tuple[float, float, int]]]]:
+        """Group learned rules by trip duration, sorted by miles"""
+        grouped: Dict[int, List[Tuple[float, float, int]]] = {}
+        for key, value in self.rules.items():
+            if value != 0:
+                days, miles, receipts = split_key(key)
+                grouped.setdefault(days, []).append((miles, receipts, value))
+        self._by_days = {}
+        for days, rows in grouped.items():
+            rows.sort()
+            self._by_days[days] = ([row[0] for row in rows], rows)
+        return self._by_days
+    
+    def predict_nearest(self, trip_duration_days: int, miles_traveled: float, total_receipts_amount: float,
+                        window: int = 8) -> float:
+        """Output of the closest learned rule with the same trip duration (returns 0 if there is none)"""
+        index = self._by_days if self._by_days is not None else self._build_index()
+        bucket = index.get(trip_duration_days)
+        if not bucket:
+            return 0.0
+        miles_sorted, rows = bucket
+        pos = bisect_left(miles_sorted, miles_traveled)
+        best_output, best_distance = 0, float('inf')
+        for miles, receipts, output in rows[max(0, pos - window):pos + window]:
+            distance = abs(miles - miles_traveled) + abs(receipts - total_receipts_amount)
+            if distance < best_distance:
+                best_output, best_distance = output, distance
+        return best_output / 100
+    
+    def _build_trie(self) -> Dict[int, Dict[int, Dict[int, int]]]:
+        """Nest rules by days, then miles cents, then receipts cents"""
+        self._trie = {}
+        for key, value in self.rules.items():
+            self._trie.setdefault(key & 0xFFFF, {}).setdefault((key >> 16) & 0xFFFFFF, {})[key >> 40] = value
+        return self._trie
     
     def predict(self, trip_duration_days: int, miles_traveled: float, total_receipts_amount: float) -> float:
-        """Predict output for given inputs using exact rules (returns 0 if not found)"""
-        key = self._make_key(trip_duration_days, miles_traveled, total_receipts_amount)
-        return self.rules.get(key, 0.0)  # Default to 0 if not found
+        """Predict output for given inputs using exact rules, falling back to the nearest learned rule"""
+        return self.predict_cents(trip_duration_days, int(miles_traveled * 100 + 0.5),
+                                  int(total_receipts_amount * 100 + 0.5))
+    
+    def predict_cents(self, trip_duration_days: int, miles_cents: int, receipts_cents: int) -> float:
+        """predict for inputs already quantized with to_cents"""
+        # Walk days -> miles -> receipts; a miss at days or miles skips the remaining levels
+        trie = self._trie if self._trie is not None else self._build_trie()
+        by_miles = trie.get(trip_duration_days)
+        if by_miles:
+            by_receipts = by_miles.get(miles_cents)
+            if by_receipts:
+                output = by_receipts.get(receipts_cents)
+                if output:
+                    return output / 100
+        return self.predict_nearest(trip_duration_days, miles_cents / 100, receipts_cents / 100)
+    
+    def predict_batch(self, days: List[int], miles: List[float], receipts: List[float]) -> List[float]:
+        """Predict outputs for parallel sequences of inputs in one call"""
+        predict_cents = self.predict_cents
+        return [predict_cents(d, int(m * 100 + 0.5), int(r * 100 + 0.5)) for d, m, r in zip(days, miles, receipts)]
+    
+    def predict_many(self, days, miles, receipts):
+        """Batch predict over NumPy arrays with a Numba-compiled lookup (plain lists without Numba)"""
+        numba = _load_numba()
+        if not numba:
+            return self.predict_batch(list(days), list(miles), list(receipts))
+        np, types, TypedDict, lookup = numba
+        if self._table is None:
+            self._table = TypedDict.empty(types.int64, types.float64)
+            for key, value in self.rules.items():
+                self._table[key] = value / 100
+        days = np.ascontiguousarray(days, dtype=np.int64).ravel()
+        miles = np.ascontiguousarray(miles, dtype=np.float64).ravel()
+        receipts = np.ascontiguousarray(receipts, dtype=np.float64).ravel()
+        out = np.empty(days.size, dtype=np.float64)
+        lookup(days, miles, receipts, self._table, out)
+        # Misses and unlearned rules take the same nearest-rule fallback as predict
+        for i in np.flatnonzero(out == 0.0):
+            out[i] = self.predict_nearest(int(days[i]), float(miles[i]), float(receipts[i]))
+        return out
     
     def get_rule_count(self) -> int:
         """Get number of rules currently stored"""
@@ -70,7 +419,7 @@ class RulesEngine:
     
     def get_zero_count(self) -> int:
         """Get number of rules that are still set to 0"""
-        return sum(1 for value in self.rules.values() if value == 0.0)
+        return self._zero_count
     
     def initialize_from_private_cases(self, private_cases_file: str = "private_cases.json"):
         """Initialize rules from private test cases with all outputs set to 0"""
@@ -78,13 +427,17 @@ class RulesEngine:
             with open(private_cases_file, 'r') as f:
                 cases = json.load(f)
             
-            for case in cases:
-                self.add_rule(
-                    case['trip_duration_days'],
-                    case['miles_traveled'],
-                    case['total_receipts_amount'],
-                    0.0  # Start with 0 for all outputs
-                )
+            # Quantize once at ingest and build the keys directly
+            self.rules.update(
+                (fuse_cents_key(case['trip_duration_days'],
+                                to_cents(case['miles_traveled']),
+                                to_cents(case['total_receipts_amount'])), 0)  # Start with 0 for all outputs
+                for case in cases
+            )
+            self._by_days = None
+            self._table = None
+            self._trie = None
+            self._zero_count = sum(1 for value in self.rules.values() if value == 0)
             
             self.save_rules()
             if not self.quiet:
@@ -93,31 +446,77 @@ class RulesEngine:
             if not self.quiet:
                 print(f"Error initializing from private cases: {e}")
     
-    def update_rules_from_errors(self, error_cases: List[Dict]):
-        """Update rules based on error cases from evaluation"""
-        updated_count = 0
+    def update_rules_from_errors(self, error_cases: List[Dict]) -> int:
+        """Update rules based on error cases from evaluation, returning how many rules actually changed"""
+        updated_keys = []
         for error_case in error_cases:
             input_data = error_case['input']
             expected_output = error_case['expected_output']
             
+            key = self._make_key(
+                input_data['trip_duration_days'],
+                input_data['miles_traveled'],
+                input_data['total_receipts_amount']
+            )
+            if self.rules.get(key) == to_cents(expected_output):
+                continue  # Already memorized
             self.add_rule(
                 input_data['trip_duration_days'],
                 input_data['miles_traveled'], 
                 input_data['total_receipts_amount'],
                 expected_output
             )
-            updated_count += 1
+            updated_keys.append(key)
         
-        self.save_rules()
+        # Only the changed rules hit disk; save_rules() folds the journal back in
+        if updated_keys:
+            self._append_journal(updated_keys)
         if not self.quiet:
-            print(f"Updated {updated_count} rules from error cases")
+            print(f"Updated {len(updated_keys)} rules from error cases")
+        return len(updated_keys)
 
 
-def load_engine(quiet: bool = True) -> RulesEngine:
+def load_engine(quiet: bool = True, rules_file: str = "rules.json") -> RulesEngine:
     """Load the rules engine (quiet by default for production use)"""
-    return RulesEngine(quiet=quiet)
+    return RulesEngine(rules_file, quiet=quiet)
 
 
 def predict_amount(engine: RulesEngine, trip_duration_days: int, miles_traveled: float, total_receipts_amount: float) -> float:
     """Predict reimbursement amount using rules engine"""
-    return engine.predict(trip_duration_days, miles_traveled, total_receipts_amount) 
\ No newline at end of file
+    return engine.predict(trip_duration_days, miles_traveled, total_receipts_amount) 
+
+
+
+def make_predictor(engine: RulesEngine) -> Callable[[int, int, int], float]:
+    """Return predict_cents as a closure over the engine's current rules dict (rebuild after load_rules)"""
+    get = engine.rules.get
+    in_range = _key_in_range
+    nearest = engine.predict_nearest
+    
+    def fast_predict(trip_duration_days: int, miles_cents: int, receipts_cents: int) -> float:
+        output = (get(trip_duration_days | (miles_cents << 16) | (receipts_cents << 40))
+                  if in_range(trip_duration_days, miles_cents, receipts_cents) else None)
+        if output:
+            return output / 100
+        return nearest(trip_duration_days, miles_cents / 100, receipts_cents / 100)
+    
+    return fast_predict
+
+
+def load_predictor(rules_file: str = "rules.json") -> Callable[[int, int, int], float]:
+    """Return a cents-level predictor, using the compiled rules table (rules_ext.py) when it is current"""
+    from rules_ext import load_extension
+    
+    compiled = load_extension(rules_file)
+    if compiled is None:
+        return make_predictor(load_engine(rules_file=rules_file))
+    
+    def fast_predict(trip_duration_days: int, miles_cents: int, receipts_cents: int) -> float:
+        output = (compiled(trip_duration_days, miles_cents, receipts_cents)
+                  if _key_in_range(trip_duration_days, miles_cents, receipts_cents) else None)
+        if output:
+            return output
+        # Nearest-rule fallback needs the full engine; only load it on a miss
+        return make_predictor(load_engine(rules_file=rules_file))(trip_duration_days, miles_cents, receipts_cents)
+    
+    return fast_predict
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Compiled lookup table for a fixed rule set.
+
+Once the rules have stopped changing, build a minimal-probe perfect hash (hash-and-displace) over
+the fused rule keys and emit it as a C shared library. Each lookup is then one hash, one
+displacement load and one key compare in native code. The library is loaded with ctypes and is
+only used while the rules file it was built from is unchanged and has no pending journal.
+
+    python rules_ext.py          # build rules_table.so from rules.json
+"""
+
+import ctypes
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, Tuple, Optional, Callable, List
+
+LIBRARY_FILE = "rules_table.so"
+
+_MASK = 0xFFFFFFFFFFFFFFFF
+_DISPLACE = 0x9E3779B97F4A7C15
+_EMPTY_KEY = _MASK  # Never a fused key: days use only the low 16 bits
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer, matching mix() in the generated C"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def _slot(key: int, displacement: int, table_size: int) -> int:
+    return _mix(key ^ (((displacement + 1) * _DISPLACE) & _MASK)) % table_size
+
+
+def build_perfect_hash(keys: List[int]) -> Tuple[List[int], List[int]]:
+    """Return (displacement per bucket, key per slot) so every key lands in its own slot"""
+    bucket_count = max(1, len(keys) // 4)
+    table_size = max(1, len(keys) * 5 // 4)
+    buckets: List[List[int]] = [[] for _ in range(bucket_count)]
+    for key in keys:
+        buckets[_mix(key) % bucket_count].append(key)
+
+    displacements = [0] * bucket_count
+    slots = [_EMPTY_KEY] * table_size
+    # Place the largest buckets first while the table is emptiest
+    for bucket_index in sorted(range(bucket_count), key=lambda i: len(buckets[i]), reverse=True):
+        bucket = buckets[bucket_index]
+        if not bucket:
+            break
+        displacement = 0
+        while True:
+            candidate = [_slot(key, displacement, table_size) for key in bucket]
+            if len(set(candidate)) == len(candidate) and all(slots[s] == _EMPTY_KEY for s in candidate):
+                break
+            displacement += 1
+        displacements[bucket_index] = displacement
+        for key, s in zip(bucket, candidate):
+            slots[s] = key
+    return displacements, slots
+
+
+def generate_source(rules: Dict[int, int], stamp: Tuple[int, int]) -> str:
+    """Emit C source for rules_predict(days, miles_cents, receipts_cents) over a perfect hash of output cents"""
+    displacements, slots = build_perfect_hash(list(rules))
+    values = [str(rules[key]) if key != _EMPTY_KEY else "0" for key in slots]
+    return f"""#include <stdint.h>
+
+#define BUCKETS {len(displacements)}ULL
+#define TABLE_SIZE {len(slots)}ULL
+
+static const int64_t STAMP[2] = {{{stamp[0]}LL, {stamp[1]}LL}};
+static const uint32_t DISPLACEMENTS[] = {{{",".join(map(str, displacements))}}};
+static const uint64_t KEYS[] = {{{",".join(f"{key}ULL" for key in slots)}}};
+static const int32_t VALUES[] = {{{",".join(values)}}};
+
+static uint64_t mix(uint64_t x) {{
+    x += 0x9E3779B97F4A7C15ULL;
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EBULL;
+    return x ^ (x >> 31);
+}}
+
+int64_t rules_stamp(int index) {{
+    return STAMP[index];
+}}
+
+double rules_predict(int64_t days, int64_t miles_cents, int64_t receipts_cents) {{
+    if (days < 0 || days >= 0x10000 || miles_cents < 0 || miles_cents >= 0x1000000
+            || receipts_cents < 0 || receipts_cents >= 0x800000) {{
+        return 0.0;  /* Outside the fused key fields, so no rule can match */
+    }}
+    uint64_t key = (uint64_t)days | ((uint64_t)miles_cents << 16) | ((uint64_t)receipts_cents << 40);
+    uint64_t displacement = DISPLACEMENTS[mix(key) % BUCKETS];
+    uint64_t slot = mix(key ^ ((displacement + 1) * 0x{_DISPLACE:X}ULL)) % TABLE_SIZE;
+    return KEYS[slot] == key ? VALUES[slot] / 100.0 : 0.0;
+}}
+"""
+
+
+def build_extension(rules: Dict[int, int], stamp: Tuple[int, int], library_file: str = LIBRARY_FILE,
+                    compiler: str = "cc") -> str:
+    """Compile the perfect-hash table for rules into a shared library"""
+    with tempfile.TemporaryDirectory() as build_dir:
+        source_file = os.path.join(build_dir, "rules_table.c")
+        with open(source_file, 'w') as f:
+            f.write(generate_source(rules, stamp))
+        subprocess.run([compiler, "-O2", "-shared", "-fPIC", "-o", library_file, source_file], check=True)
+    return library_file
+
+
+def load_extension(rules_file: str = "rules.json",
+                   library_file: Optional[str] = None) -> Optional[Callable[[int, int, int], float]]:
+    """Return the compiled rules_predict if it was built from the current rules file, else None
+
+    library_file defaults to LIBRARY_FILE next to rules_file.
+    """
+    if library_file is None:
+        library_file = os.path.join(os.path.dirname(rules_file), LIBRARY_FILE)
+    journal_file = os.path.splitext(rules_file)[0] + ".journal"
+    if not os.path.exists(library_file) or os.path.exists(journal_file):
+        return None
+    try:
+        library = ctypes.CDLL(os.path.abspath(library_file))
+        stat = os.stat(rules_file)
+    except OSError:
+        return None
+    library.rules_stamp.restype = ctypes.c_int64
+    library.rules_stamp.argtypes = [ctypes.c_int]
+    if (library.rules_stamp(0), library.rules_stamp(1)) != (stat.st_mtime_ns, stat.st_size):
+        return None
+    library.rules_predict.restype = ctypes.c_double
+    library.rules_predict.argtypes = [ctypes.c_int64, ctypes.c_int64, ctypes.c_int64]
+    return library.rules_predict
+
+
+def main():
+    from rules_engine import RulesEngine
+
+    engine = RulesEngine(quiet=True)
+    if engine.get_rule_count() == 0:
+        print("No rules to compile", file=sys.stderr)
+        sys.exit(1)
+    engine.save_rules()  # Fold any journal into rules.json so the stamp covers every rule
+    stat = os.stat(engine.rules_file)
+    library_file = build_extension(engine.rules, (stat.st_mtime_ns, stat.st_size))
+    print(f"Compiled {engine.get_rule_count()} rules into {library_file}")
+
+
+if __name__ == "__main__":
+    main()
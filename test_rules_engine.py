@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the rules engine.
+
+    python -m unittest test_rules_engine
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import rules_engine
+from rules_engine import RulesEngine, read_journal, fuse_key, fuse_cents_key, split_key, make_predictor
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.rules_file = os.path.join(self.tmp_dir, "rules.json")
+        engine = RulesEngine(self.rules_file, quiet=True)
+        engine.add_rule(1, 10.0, 5.0, 0.0)
+        engine.add_rule(2, 20.0, 6.0, 0.0)
+        engine.save_rules()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _update(self, engine: RulesEngine, days: int, miles: float, receipts: float, output: float):
+        engine.update_rules_from_errors([{
+            'input': {'trip_duration_days': days, 'miles_traveled': miles, 'total_receipts_amount': receipts},
+            'expected_output': output
+        }])
+
+    def test_append_after_torn_tail(self):
+        engine = RulesEngine(self.rules_file, quiet=True)
+        self._update(engine, 1, 10.0, 5.0, 55.0)
+        engine._journal.close()
+        with open(engine.journal_file, 'ab') as f:
+            f.write(b'\x01\x02\x03')  # Interrupted write
+
+        engine = RulesEngine(self.rules_file, quiet=True)
+        self._update(engine, 2, 20.0, 6.0, 77.0)
+        engine._journal.close()
+
+        self.assertEqual(list(read_journal(engine.journal_file)),
+                         [(fuse_key(1, 10.0, 5.0), 5500), (fuse_key(2, 20.0, 6.0), 7700)])
+        reloaded = RulesEngine(self.rules_file, quiet=True)
+        self.assertEqual(reloaded.get_rule_count(), 2)
+        self.assertEqual(reloaded.predict(1, 10.0, 5.0), 55.0)
+        self.assertEqual(reloaded.predict(2, 20.0, 6.0), 77.0)
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.rules_file = os.path.join(self.tmp_dir, "rules.json")
+        engine = RulesEngine(self.rules_file, quiet=True)
+        engine.add_rule(1, 10.0, 5.0, 11.0)
+        engine.save_rules()
+        os.remove(engine.cache_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_rules_published_mid_load_are_not_masked_by_cache(self):
+        loads = rules_engine._loads
+
+        def publish_then_parse(raw):
+            # A writer saves new rules after the reader has read the old file but before it writes the cache
+            patcher.stop()
+            writer = RulesEngine(self.rules_file, quiet=True)
+            writer.add_rule(1, 10.0, 5.0, 99.0)
+            writer.save_rules()
+            os.remove(writer.cache_file)
+            return loads(raw)
+
+        patcher = mock.patch.object(rules_engine, '_loads', side_effect=publish_then_parse)
+        with patcher:
+            stale = RulesEngine(self.rules_file, quiet=True)
+        self.assertEqual(stale.predict(1, 10.0, 5.0), 11.0)
+        self.assertEqual(RulesEngine(self.rules_file, quiet=True).predict(1, 10.0, 5.0), 99.0)
+
+
+class FusedKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.rules_file = os.path.join(self.tmp_dir, "rules.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        self.assertEqual(split_key(fuse_key(14, 1348.59, 2503.46)), (14, 1348.59, 2503.46))
+
+    def test_out_of_range_rejected(self):
+        for days, miles_cents, receipts_cents in [(1, -500, 300), (1, 1 << 24, 300), (1, 500, -1),
+                                                  (1, 500, 1 << 23), (1 << 16, 500, 300), (-1, 500, 300)]:
+            with self.assertRaises(ValueError):
+                fuse_cents_key(days, miles_cents, receipts_cents)
+
+    def test_add_rule_rejects_negative_miles(self):
+        engine = RulesEngine(self.rules_file, quiet=True)
+        with self.assertRaises(ValueError):
+            engine.add_rule(1, -5.0, 3.0, 10.0)
+        self.assertEqual(engine.get_rule_count(), 0)
+
+    def test_large_days_do_not_alias(self):
+        engine = RulesEngine(self.rules_file, quiet=True)
+        engine.add_rule(1, 10.0, 5.0, 42.0)
+        predict = make_predictor(engine)
+        self.assertEqual(predict(1, 1000, 500), 42.0)
+        self.assertEqual(predict((1 << 16) + 1, 1000, 500), 0.0)
+        self.assertEqual(engine.predict((1 << 16) + 1, 10.0, 5.0), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()